@@ -0,0 +1,39 @@
+#!/usr/bin/env python3
+"""
+Pre-build the JSON cache sidecar (config.yaml.json) for YAML config files.
+
+The detector and utils/verify.py read the sidecar instead of parsing YAML
+when it is at least as new as the YAML source, so running this at
+install/deploy time keeps PyYAML off their start-up paths.
+"""
+import json
+import sys
+import yaml
+from pathlib import Path
+
+DEFAULT_CONFIGS = ["config/config.yaml", "src/config/config.yaml"]
+
+def build_cache(config_path):
+    """Parse a YAML config and write its JSON sidecar next to it."""
+    config_path = Path(config_path)
+    with open(config_path) as f:
+        config = yaml.load(f, Loader=getattr(yaml, "CSafeLoader", yaml.SafeLoader)) or {}
+
+    json_path = config_path.with_name(config_path.name + ".json")
+    with open(json_path, "w") as f:
+        json.dump(config, f)
+    return json_path
+
+def main():
+    paths = sys.argv[1:] or DEFAULT_CONFIGS
+    failed = False
+    for path in paths:
+        try:
+            print(f"Wrote {build_cache(path)}")
+        except Exception as e:
+            print(f"Failed to build cache for {path}: {e}")
+            failed = True
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
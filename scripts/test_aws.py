@@ -7,11 +7,25 @@ import sys
 import json
 from pathlib import Path
 
+import boto3
+
 # AWS Configuration
 AWS_REGION = "us-east-1"
 AWS_PROFILE = "default"
 TEST_TOPIC = "test/connectivity"
 
+_session = None
+
+def get_session():
+    """Return one boto3 session shared by all AWS checks"""
+    global _session
+    if _session is None:
+        _session = boto3.Session(
+            profile_name=AWS_PROFILE if AWS_PROFILE != "default" else None,
+            region_name=AWS_REGION
+        )
+    return _session
+
 def check_greengrass_service():
     """Check if Greengrass service is running"""
     try:
@@ -39,19 +53,9 @@ def check_credentials():
 def check_aws_connectivity():
     """Test AWS IoT connectivity"""
     try:
-        cmd = [
-            'aws', 'iot', 'describe-endpoint',
-            '--endpoint-type', 'iot:Data-ATS',
-            '--query', 'endpointAddress',
-            '--output', 'text'
-        ]
-        if AWS_PROFILE != "default":
-            cmd.extend(['--profile', AWS_PROFILE])
-            
-        result = subprocess.run(cmd, capture_output=True, text=True)
-        if result.returncode == 0:
-            return True, f"AWS IoT endpoint: {result.stdout.strip()}"
-        return False, result.stderr.strip()
+        iot = get_session().client('iot')
+        endpoint = iot.describe_endpoint(endpointType='iot:Data-ATS')['endpointAddress']
+        return True, f"AWS IoT endpoint: {endpoint}"
     except Exception as e:
         return False, str(e)
 
@@ -60,20 +64,9 @@ def check_mqtt_connectivity():
     payload = json.dumps({"test": "AWS MQTT Connectivity Check"})
     
     try:
-        cmd = [
-            'aws', 'iot-data', 'publish',
-            '--topic', TEST_TOPIC,
-            '--cli-binary-format', 'raw-in-base64-out',
-            '--payload', payload,
-            '--region', AWS_REGION
-        ]
-        if AWS_PROFILE != "default":
-            cmd.extend(['--profile', AWS_PROFILE])
-            
-        result = subprocess.run(cmd, capture_output=True, text=True)
-        if result.returncode == 0:
-            return True, f"Successfully published to topic {TEST_TOPIC}"
-        return False, result.stderr.strip()
+        iot_data = get_session().client('iot-data')
+        iot_data.publish(topic=TEST_TOPIC, qos=0, payload=payload.encode())
+        return True, f"Successfully published to topic {TEST_TOPIC}"
     except Exception as e:
         return False, str(e)
 
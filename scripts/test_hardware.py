@@ -77,12 +77,16 @@ def test_motor():
         GPIO.output(DIR_PIN, GPIO.HIGH)
         print("Motor enabled - beginning test movement (50 steps)")
         
-        # 50 steps
+        # 50 steps, timed against absolute deadlines so sleep overshoot does not accumulate
+        delay_ns = 10_000_000
+        deadline = time.monotonic_ns()
         for step in range(50):
             GPIO.output(STEP_PIN, GPIO.HIGH)
-            time.sleep(0.01)
+            deadline += delay_ns
+            time.sleep(max(0, deadline - time.monotonic_ns()) / 1e9)
             GPIO.output(STEP_PIN, GPIO.LOW)
-            time.sleep(0.01)
+            deadline += delay_ns
+            time.sleep(max(0, deadline - time.monotonic_ns()) / 1e9)
             if step % 10 == 0:
                 print(f"  Step {step + 1}/50 completed")
             
@@ -30,7 +30,7 @@ def check_gpio():
     try:
         GPIO.setmode(GPIO.BOARD)
         GPIO.setup(12, GPIO.OUT)
-        GPIO.cleanup()
+        GPIO.cleanup(12)  # Release only the probed pin
         return True, "GPIO working"
     except Exception as e:
         return False, f"GPIO error: {str(e)}"
@@ -44,7 +44,8 @@ def check_config():
     
     try:
         with open(config_path) as f:
-            yaml.safe_load(f)
+            # libyaml C parser when available, pure-Python fallback otherwise
+            yaml.load(f, Loader=getattr(yaml, "CSafeLoader", yaml.SafeLoader))
         return True, "Config valid"
     except Exception as e:
         return False, f"Config error: {str(e)}"
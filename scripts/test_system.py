@@ -1,66 +1,104 @@
 import os
 import sys
 import subprocess
-import psutil
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+CPU_SAMPLE_INTERVAL = 0.1  # Seconds between the two /proc/stat samples
+# /proc files are read with one syscall into this reused buffer
+_PROC_BUF = bytearray(8192)
+
+def read_proc(path):
+    """Read a small /proc file in a single read."""
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        n = os.readv(fd, [_PROC_BUF])
+    finally:
+        os.close(fd)
+    return bytes(_PROC_BUF[:n])
+
+def cpu_times():
+    """Return (idle, total) jiffies from the aggregate line of /proc/stat."""
+    fields = [int(v) for v in read_proc('/proc/stat').split(b'\n', 1)[0].split()[1:9]]
+    # idle + iowait count as idle; guest time is already included in user
+    return fields[3] + fields[4], sum(fields)
+
+def cpu_percent(interval=CPU_SAMPLE_INTERVAL):
+    """CPU usage in percent, as the busy share of two samples `interval` seconds apart."""
+    last_idle, last_total = cpu_times()
+    time.sleep(interval)
+    idle, total = cpu_times()
+    if total == last_total:
+        return 0.0
+    return round(100.0 * (1.0 - (idle - last_idle) / (total - last_total)), 1)
+
+def memory_available():
+    """MemAvailable from /proc/meminfo, in bytes."""
+    for line in read_proc('/proc/meminfo').splitlines():
+        if line.startswith(b'MemAvailable:'):
+            return int(line.split()[1]) * 1024
+    return 0
 
 def check_environment():
-    """Verify Python environment and dependencies."""
+    """Verify Python environment and dependencies; return (ok, message)."""
     try:
         import cv2
         import numpy
         import RPi.GPIO
-        print("Required packages available")
-        return True
+        return True, "Required packages available"
     except ImportError as e:
-        print(f"Missing package: {e}")
-        return False
+        return False, f"Missing package: {e}"
 
 def check_camera():
-    """Verify camera device exists."""
-    return os.path.exists('/dev/video0')
+    """Verify camera device exists; return (ok, message)."""
+    return os.path.exists('/dev/video0'), None
 
 def check_gpio():
-    """Verify GPIO access."""
+    """Verify GPIO access; return (ok, message)."""
     try:
         import RPi.GPIO as GPIO
         GPIO.setmode(GPIO.BOARD)
         GPIO.setup(12, GPIO.OUT)
-        GPIO.cleanup()
-        return True
+        GPIO.cleanup(12)  # Release only the probed pin
+        return True, None
     except Exception as e:
-        print(f"GPIO test failed: {e}")
-        return False
+        return False, f"GPIO test failed: {e}"
 
 def check_system_resources():
     """Check system resources."""
-    cpu_percent = psutil.cpu_percent()
-    memory = psutil.virtual_memory()
-    disk = psutil.disk_usage('/')
+    disk = os.statvfs('/')
     
     return {
-        "cpu_usage": cpu_percent,
-        "memory_available": memory.available / (1024 * 1024),  # MB
-        "disk_free": disk.free / (1024 * 1024 * 1024)  # GB
+        "cpu_usage": cpu_percent(),
+        "memory_available": memory_available() / (1024 * 1024),  # MB
+        "disk_free": disk.f_bavail * disk.f_frsize / (1024 * 1024 * 1024)  # GB
     }
 
 def main():
     print("Running system tests...\n")
     
-    # Check Python environment
-    print("1. Checking Python environment...")
-    env_ok = check_environment()
-    
-    # Check camera
-    print("\n2. Checking camera...")
-    camera_ok = check_camera()
-    
-    # Check GPIO
-    print("\n3. Checking GPIO...")
-    gpio_ok = check_gpio()
+    # The checks are independent, so run them concurrently; they return their
+    # messages instead of printing, so the report below keeps the original order
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        env_future = executor.submit(check_environment)
+        camera_future = executor.submit(check_camera)
+        gpio_future = executor.submit(check_gpio)
+        resources_future = executor.submit(check_system_resources)
+        env_ok, env_message = env_future.result()
+        camera_ok, camera_message = camera_future.result()
+        gpio_ok, gpio_message = gpio_future.result()
+        resources = resources_future.result()
     
-    # Check system resources
-    print("\n4. Checking system resources...")
-    resources = check_system_resources()
+    sections = [
+        ("1. Checking Python environment...", env_message),
+        ("\n2. Checking camera...", camera_message),
+        ("\n3. Checking GPIO...", gpio_message),
+        ("\n4. Checking system resources...", None),
+    ]
+    for header, message in sections:
+        print(header)
+        if message:
+            print(message)
     
     # Print results
     print("\nTest Results:")
@@ -15,22 +15,36 @@ the model’s prediction and DEBUG_SAVE_IMAGES saves each captured image with
 debug metadata.
 """
 
+import os
+
+# A single GEMV per burst gains nothing from BLAS worker threads, which would only
+# contend with the grabber, publisher and dispenser threads; must be set before numpy loads
+for _var in ("OPENBLAS_NUM_THREADS", "OMP_NUM_THREADS"):
+    os.environ.setdefault(_var, "1")
+
 import cv2
 import numpy as np
 import joblib
 import time
 import json
-import os
+import math
 import sys
-import traceback
 import logging
+import copy
+import queue
+import signal
+import threading
 import yaml
 import RPi.GPIO as GPIO
 import csv
-from datetime import datetime
+from collections import OrderedDict
+
+try:
+    import pigpio
+except ImportError:  # Optional: without pigpio, step pulses are software-timed
+    pigpio = None
 
 import awsiot.greengrasscoreipc
-import awsiot.greengrasscoreipc.client as client
 from awsiot.greengrasscoreipc.model import (
     PublishToIoTCoreRequest,
     QOS,
@@ -50,130 +64,441 @@ logging.basicConfig(
 logger = logging.getLogger("BowlStateAndHopper")
 
 # Detector configuration
-IMAGE_SIZE = (224, 224)
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+CONFIG_PATH = os.path.join(BASE_DIR, "config.yaml")
+MODEL_PATH = os.path.join(BASE_DIR, "bowl_state_model.joblib")
+IMAGE_SIZE = (224, 224)  # Default model input (width, height) if config.yaml has no vision.image_size
 CONFIDENCE_THRESHOLD = 0.7
+LOOP_INTERVAL = 10.0  # Seconds between detection ticks
 CAMERA_ID = 0
-CAMERA_WIDTH = 640
-CAMERA_HEIGHT = 480
+CAMERA_BACKEND = cv2.CAP_V4L2  # Open V4L2 directly instead of probing backends (GStreamer first)
+# Capture close to the model input size; the frame is downsampled to it anyway
+CAMERA_WIDTH = 320
+CAMERA_HEIGHT = 240
+CAMERA_FOURCC = "MJPG"  # Compressed stream: far less USB bandwidth than raw YUYV
+FIRST_FRAME_TIMEOUT = 5.0  # Seconds a read waits for the grabber's first frame
+
+# MQTT publishing
+STATE_TOPIC = "bowl/state"
+COMMAND_TOPIC = "bowl/command"
+PUBLISH_QUEUE_SIZE = 4  # Pending state updates; newer ones are dropped when full
+STATE_HEARTBEAT_INTERVAL = 30.0  # Seconds; an unchanged state is republished this often
+# Fixed-shape state message; formatting it directly skips building a dict for json.dumps
+STATE_PAYLOAD_TEMPLATE = (
+    '{"message": "Bowl State Update", "empty": %s, "confidence": %r, '
+    '"timestamp": %r, "activateMotor": %s}'
+)
+JSON_BOOL = {True: "true", False: "false"}
+
+DEBUG_QUEUE_SIZE = 8  # Debug captures waiting to be written; newer ones are dropped when full
+
+# Dispense only when enough of the most recent ticks saw an empty bowl, so one
+# misclassified frame neither triggers nor cancels a dispense
+DISPENSE_WINDOW_MASK = 0xF  # Last 4 ticks, one bit each (1 = confidently empty)
+DISPENSE_MIN_EMPTY = 3
+
+# Dispensing runs on its own worker; at most this many requests wait behind the active one
+DISPENSE_QUEUE_SIZE = 1
+DISPENSE_RT_PRIORITY = 10  # SCHED_FIFO priority for the dispenser thread; needs root or CAP_SYS_NICE
+
+# Frame-difference gate: reuse the last prediction while the scene is unchanged
+FRAME_DIFF_SIZE = (32, 32)     # Greyscale thumbnail compared between checks
+FRAME_DIFF_THRESHOLD = 2.0     # Mean absolute grey-level change that forces inference
+MAX_PREDICTION_REUSE = 5       # Always re-run inference after this many reuses
+# Each inference scores a short burst of frames and averages their logits
+BURST_FRAMES = 4
+BURST_INTERVAL = 0.05  # Seconds between burst frames; longer than one frame period
+
+# Physical header (BOARD) pin -> Broadcom GPIO number. config.yaml lists header
+# pins; they are translated once at setup and driven in BCM mode, which both
+# RPi.GPIO and pigpio use natively
+BOARD_TO_BCM = {
+    3: 2, 5: 3, 7: 4, 8: 14, 10: 15, 11: 17, 12: 18, 13: 27, 15: 22, 16: 23,
+    18: 24, 19: 10, 21: 9, 22: 25, 23: 11, 24: 8, 26: 7, 27: 0, 28: 1, 29: 5,
+    31: 6, 32: 12, 33: 13, 35: 19, 36: 16, 37: 26, 38: 20, 40: 21,
+}
+MAX_WAVE_REPEATS = 0xFFFF  # Largest loop count a single pigpio wave chain accepts
+# Sleep through most of a long wait but wake this early and spin to the deadline,
+# since sleep() can overshoot by ~100 us on a Pi; waits shorter than MIN_SLEEP_NS just spin
+SLEEP_MARGIN_NS = 150_000
+MIN_SLEEP_NS = 300_000
+
+# Parsed YAML configs keyed by absolute path -> ((st_mtime, st_size), config)
+_CONFIG_CACHE = OrderedDict()
+_CONFIG_CACHE_SIZE = 16
+# Loaded models keyed by path -> ((st_mtime, st_size), model)
+_MODEL_CACHE = {}
+# Prefer the libyaml C parser when PyYAML was built with it
+_YAML_LOADER = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+def _read_config_file(path, st):
+    """Parse config.yaml, preferring a fresh config.yaml.json sidecar when present."""
+    json_path = path + ".json"
+    try:
+        if os.stat(json_path).st_mtime >= st.st_mtime:
+            with open(json_path, "r") as f:
+                return json.load(f)
+    except (OSError, ValueError):
+        pass
+
+    with open(path, "r") as f:
+        config = yaml.load(f, Loader=_YAML_LOADER) or {}
+    try:
+        with open(json_path, "w") as f:
+            json.dump(config, f)
+    except (OSError, TypeError, ValueError) as e:
+        logger.debug("Could not write config cache %s: %s", json_path, e)
+    return config
+
+def load_config(path):
+    """Load a YAML config file, reusing the parsed result while the file is unchanged."""
+    path = os.path.abspath(path)
+    st = os.stat(path)
+    signature = (st.st_mtime, st.st_size)
+    cached = _CONFIG_CACHE.get(path)
+    if cached is not None and cached[0] == signature:
+        _CONFIG_CACHE.move_to_end(path)
+        return copy.deepcopy(cached[1])
+
+    config = _read_config_file(path, st)
+    _CONFIG_CACHE[path] = (signature, config)
+    _CONFIG_CACHE.move_to_end(path)
+    while len(_CONFIG_CACHE) > _CONFIG_CACHE_SIZE:
+        _CONFIG_CACHE.popitem(last=False)
+    return copy.deepcopy(config)
+
+def board_to_bcm(pin):
+    """Translate a physical header (BOARD) pin number to its Broadcom GPIO number."""
+    try:
+        return BOARD_TO_BCM[pin]
+    except KeyError:
+        raise ValueError(f"motor pin {pin} is not a GPIO header pin") from None
+
+def wait_until(deadline_ns):
+    """Block until time.monotonic_ns() reaches deadline_ns, spinning for short waits."""
+    remaining = deadline_ns - time.monotonic_ns()
+    if remaining > MIN_SLEEP_NS:
+        time.sleep((remaining - SLEEP_MARGIN_NS) / 1e9)
+    while time.monotonic_ns() < deadline_ns:
+        pass
+
+def set_realtime_priority(priority):
+    """Best effort: move the calling thread to SCHED_FIFO at `priority`."""
+    try:
+        os.sched_setscheduler(0, os.SCHED_FIFO, os.sched_param(priority))
+        return True
+    except (AttributeError, OSError) as e:
+        logger.info("Real-time scheduling unavailable (%s); keeping default priority", e)
+        return False
+
+class StopRequested(BaseException):
+    """Raised from the SIGTERM handler to unwind run() through its cleanup."""
+
+class LatestFrameGrabber:
+    """Grab camera frames continuously in the background so reads get the newest one."""
+
+    def __init__(self, cap):
+        self.cap = cap
+        # grab() and retrieve() must not interleave on the same VideoCapture
+        self._lock = threading.Lock()
+        # Set after the first successful grab(); until then there is nothing to retrieve
+        self._has_frame = threading.Event()
+        self._running = False
+        self._thread = None
+
+    def start(self):
+        """Start the background grab thread."""
+        self._running = True
+        self._thread = threading.Thread(target=self._grab_loop, name="FrameGrabber", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop the grab thread and wait briefly for it to exit."""
+        self._running = False
+        if self._thread is not None:
+            self._thread.join(timeout=2.0)
+
+    def _grab_loop(self):
+        """Keep draining the driver queue so the pending frame is always current."""
+        while self._running:
+            with self._lock:
+                ok = self.cap.grab()
+            if ok:
+                self._has_frame.set()
+            # Give readers waiting on the lock a chance between grabs
+            time.sleep(0.1 if not ok else 0.001)
+
+    def read(self):
+        """Decode the most recently grabbed frame, as (ret, frame).
+
+        Right after start() this waits up to FIRST_FRAME_TIMEOUT for the first grab.
+        """
+        if not self._has_frame.wait(FIRST_FRAME_TIMEOUT):
+            return False, None
+        with self._lock:
+            return self.cap.retrieve()
 
 class BowlStateAndHopperController:
     def __init__(self):
         logger.info("Initializing combined controller...")
         self.setup_motor()
+        self.load_vision_config()
         self.model = self.load_model()
+        self._weights, self._bias = self.linear_weights(self.model)
+        # Preprocessing writes into one reusable buffer instead of allocating per frame
+        width, height = self.image_size
+        self._frame_buf = np.empty((BURST_FRAMES, width * height * 3), dtype=np.uint8)
+        self._img_views = [row.reshape(height, width, 3) for row in self._frame_buf]
         self.cap = self.setup_camera()
+        self.frames = LatestFrameGrabber(self.cap)
+        self._last_thumbnail = None
+        self._last_prediction = None
+        self._prediction_reuse = 0
         self.ipc_client = None
         self.consecutive_failures = 0
         self.MAX_CONSECUTIVE_FAILURES = 3
+        # State updates are published from a background thread so a slow
+        # or disconnected IoT Core never stalls the detection loop
+        self._publish_queue = queue.Queue(maxsize=PUBLISH_QUEUE_SIZE)
+        self._publisher = None
+        # Only the publisher thread touches this, so the payload can be swapped in place
+        self._publish_request = PublishToIoTCoreRequest(topic_name=STATE_TOPIC, qos=QOS.AT_LEAST_ONCE)
+        self._last_published = None
+        self._last_publish_time = 0.0
+        # Debug metadata CSV, opened on first use and kept open for the process lifetime
+        self._metadata_file = None
+        self._metadata_writer = None
+        # Debug JPEGs are encoded and written off the detection loop
+        self._debug_queue = queue.Queue(maxsize=DEBUG_QUEUE_SIZE)
+        self._debug_writer = None
+        # Dispense requests from the detection loop and from MQTT commands are
+        # serialized on one worker so the motor is never driven twice at once
+        self._dispense_queue = queue.Queue(maxsize=DISPENSE_QUEUE_SIZE)
+        self._dispenser = None
+        self._empty_history = 0
+        # Set by stop() to end the main loop promptly
+        self._stop_event = threading.Event()
         logger.info("Initialization complete")
 
     def setup_motor(self):
         """Initialize motor configuration and GPIO setup."""
         self.load_motor_config()
         logger.info("Setting up GPIO pins...")
-        GPIO.setmode(GPIO.BOARD)
-        GPIO.setup([self.step_pin, self.dir_pin, self.en_pin], GPIO.OUT)
+        self.step_gpio = board_to_bcm(self.step_pin)
+        self.dir_gpio = board_to_bcm(self.dir_pin)
+        self.en_gpio = board_to_bcm(self.en_pin)
+        GPIO.setmode(GPIO.BCM)
+        GPIO.setup([self.step_gpio, self.dir_gpio, self.en_gpio], GPIO.OUT)
         # Disable the motor by default (assuming HIGH disables it)
-        GPIO.output(self.en_pin, GPIO.HIGH)
+        GPIO.output(self.en_gpio, GPIO.HIGH)
+        self.pi = self.setup_pigpio()
         logger.info("GPIO setup complete")
 
+    def setup_pigpio(self):
+        """Connect to the pigpio daemon so step pulses can be DMA-timed."""
+        if pigpio is None:
+            logger.info("pigpio not installed; using software-timed step pulses")
+            return None
+        pi = pigpio.pi()
+        if not pi.connected:
+            logger.warning("pigpio daemon not reachable; using software-timed step pulses")
+            return None
+        pi.set_mode(self.step_gpio, pigpio.OUTPUT)
+        logger.info("Using pigpio waveforms on GPIO%s for step pulses", self.step_gpio)
+        return pi
+
     def load_motor_config(self):
         """Load motor configuration from YAML file."""
         try:
-            config_path = os.path.join(
-                os.path.dirname(os.path.abspath(__file__)),
-                "config.yaml"
-            )
-            with open(config_path, "r") as f:
-                config = yaml.safe_load(f)
-                motor_config = config.get("hardware", {}).get("motor", {})
-                self.step_pin = motor_config.get("step_pin", 16)
-                self.dir_pin = motor_config.get("dir_pin", 15)
-                self.en_pin = motor_config.get("en_pin", 18)
-                logger.info(f"Motor configuration loaded: {motor_config}")
+            config = load_config(CONFIG_PATH)
+            motor_config = config.get("hardware", {}).get("motor", {})
+            self.step_pin = motor_config.get("step_pin", 16)
+            self.dir_pin = motor_config.get("dir_pin", 15)
+            self.en_pin = motor_config.get("en_pin", 18)
+            logger.info("Motor configuration loaded: %s", motor_config)
         except Exception as e:
-            logger.warning(f"Error loading motor config: {e}. Using default pins")
+            logger.warning("Error loading motor config: %s. Using default pins", e)
             self.step_pin, self.dir_pin, self.en_pin = 16, 15, 18
 
+    def load_vision_config(self):
+        """Load the model input size from YAML; it must match the size the model was trained at."""
+        try:
+            vision_config = load_config(CONFIG_PATH).get("vision", {})
+            self.image_size = tuple(vision_config.get("image_size", IMAGE_SIZE))
+        except Exception as e:
+            logger.warning("Error loading vision config: %s. Using default image size", e)
+            self.image_size = IMAGE_SIZE
+        logger.info("Model input size: %sx%s", *self.image_size)
+
     def load_model(self):
-        """Load the pre-trained bowl state model."""
-        base_dir = os.path.dirname(os.path.abspath(__file__))
-        model_path = os.path.join(base_dir, "bowl_state_model.joblib")
+        """Load the pre-trained bowl state model, reusing it while the file is unchanged."""
         try:
-            model = joblib.load(model_path)
-            logger.info(f"Model loaded successfully from {model_path}")
+            st = os.stat(MODEL_PATH)
+            signature = (st.st_mtime, st.st_size)
+            cached = _MODEL_CACHE.get(MODEL_PATH)
+            if cached is not None and cached[0] == signature:
+                return cached[1]
+            # Map the uncompressed arrays read-only instead of copying them onto the heap
+            model = joblib.load(MODEL_PATH, mmap_mode="r")
+            _MODEL_CACHE[MODEL_PATH] = (signature, model)
+            logger.info("Model loaded successfully from %s", MODEL_PATH)
             return model
         except Exception as e:
-            logger.error(f"Failed to load model: {e}")
-            logger.error(traceback.format_exc())
+            logger.exception("Failed to load model: %s", e)
             sys.exit(1)
 
+    def linear_weights(self, model):
+        """Extract float32 weights from a binary linear model, or (None, None)."""
+        coef = getattr(model, "coef_", None)
+        if coef is None or coef.shape[0] != 1 or len(getattr(model, "classes_", ())) != 2:
+            logger.info("Model is not a binary linear classifier; using predict_proba")
+            return None, None
+        width, height = self.image_size
+        if coef.shape[1] != width * height * 3:
+            logger.info("Model features do not match a %sx%s RGB frame; using predict_proba", width, height)
+            return None, None
+        logger.info("Using direct linear inference with %d float32 weights", coef.shape[1])
+        # The model was trained on RGB pixels; reorder its weights to BGR once here
+        # so frames can be scored straight from OpenCV without a colour conversion
+        bgr = coef[0].reshape(height, width, 3)[:, :, ::-1]
+        return np.ascontiguousarray(bgr, dtype=np.float32).ravel(), float(model.intercept_[0])
+
+    def predict(self, processed):
+        """Return [P(empty), P(full)] for preprocessed (k, N) frames, averaged over the burst."""
+        if self._weights is None:
+            return self.model.predict_proba(processed).mean(axis=0)
+        # Same result as LogisticRegression.predict_proba without sklearn's
+        # per-call validation and float64 upcast; one product scores the whole
+        # burst and the mean logit smooths out single-frame noise
+        score = float((processed @ self._weights).mean()) + self._bias
+        if score >= 0:
+            p_full = 1.0 / (1.0 + math.exp(-score))
+        else:
+            e = math.exp(score)
+            p_full = e / (1.0 + e)
+        return np.array([1.0 - p_full, p_full])
+
     def setup_camera(self):
         """Initialize the camera."""
-        cap = cv2.VideoCapture(CAMERA_ID)
+        cap = cv2.VideoCapture(CAMERA_ID, CAMERA_BACKEND)
         if not cap.isOpened():
             raise RuntimeError("Failed to open camera")
+        cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*CAMERA_FOURCC))
         cap.set(cv2.CAP_PROP_FRAME_WIDTH, CAMERA_WIDTH)
         cap.set(cv2.CAP_PROP_FRAME_HEIGHT, CAMERA_HEIGHT)
-        for _ in range(3):  # Flush a few frames
-            cap.grab()
-        logger.info(f"Camera opened with resolution {CAMERA_WIDTH}x{CAMERA_HEIGHT}")
+        # Keep only the newest frame queued so reads are never stale
+        cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+        logger.info("Camera opened with resolution %sx%s", CAMERA_WIDTH, CAMERA_HEIGHT)
         return cap
 
     def enable_motor(self):
         """Enable the stepper motor (active low)."""
         logger.info("Enabling motor")
-        GPIO.output(self.en_pin, GPIO.LOW)
+        GPIO.output(self.en_gpio, GPIO.LOW)
         time.sleep(0.05)
 
     def disable_motor(self):
         """Disable the stepper motor."""
         logger.info("Disabling motor")
-        GPIO.output(self.en_pin, GPIO.HIGH)
+        GPIO.output(self.en_gpio, GPIO.HIGH)
 
     def step(self, steps, rpm=30, steps_per_rev=200):
         """Move the motor a specified number of steps."""
-        logger.info(f"Stepping motor: {steps} steps at {rpm} RPM")
-        delay = 60.0 / (rpm * steps_per_rev)
+        logger.info("Stepping motor: %s steps at %s RPM", steps, rpm)
+        delay_ns = int(60e9 / (rpm * steps_per_rev))
+        if self.pi is not None:
+            self.step_wave(steps, delay_ns // 1000)
+            return
+        # Hoist lookups out of the timing-critical pulse loop
+        output, wait, step_pin = GPIO.output, wait_until, self.step_gpio
+        high, low = GPIO.HIGH, GPIO.LOW
+        debug = logger.isEnabledFor(logging.DEBUG)
+        # Absolute deadlines keep per-edge overshoot from accumulating into drift
+        deadline = time.monotonic_ns()
         for i in range(steps):
-            GPIO.output(self.step_pin, GPIO.HIGH)
-            time.sleep(delay)
-            GPIO.output(self.step_pin, GPIO.LOW)
-            time.sleep(delay)
+            output(step_pin, high)
+            deadline += delay_ns
+            wait(deadline)
+            output(step_pin, low)
+            deadline += delay_ns
+            wait(deadline)
+            if debug and i % 10 == 0:
+                logger.debug("Step %d/%d", i, steps)
+
+    def step_wave(self, steps, pulse_us):
+        """Emit the step train as one pigpio waveform repeated by a wave chain."""
+        mask = 1 << self.step_gpio
+        self.pi.wave_clear()
+        self.pi.wave_add_generic([
+            pigpio.pulse(mask, 0, pulse_us),
+            pigpio.pulse(0, mask, pulse_us),
+        ])
+        wave_id = self.pi.wave_create()
+        try:
+            while steps > 0:
+                repeats = min(steps, MAX_WAVE_REPEATS)
+                # Loop the single-step wave `repeats` times, timed by DMA
+                self.pi.wave_chain([255, 0, wave_id, 255, 1, repeats & 0xFF, repeats >> 8])
+                while self.pi.wave_tx_busy():
+                    time.sleep(0.01)
+                steps -= repeats
+        finally:
+            self.pi.wave_delete(wave_id)
 
     def dispense(self, portions=1):
         """Dispense a specified number of portions by stepping the motor."""
-        logger.info(f"Starting dispensing for {portions} portion(s)")
+        logger.info("Starting dispensing for %s portion(s)", portions)
+        # Dispensing changes the bowl, so never reuse a pre-dispense prediction
+        self._last_thumbnail = None
         try:
             self.enable_motor()
             steps_per_portion = 200  # Adjust as necessary for your mechanism
             for i in range(1, portions + 1):
-                logger.info(f"Dispensing portion {i}/{portions}")
+                logger.info("Dispensing portion %s/%s", i, portions)
                 self.step(steps_per_portion)
                 time.sleep(0.5)
             logger.info("Dispensing complete")
         except Exception as e:
-            logger.error(f"Error during dispensing: {e}")
-            logger.error(traceback.format_exc())
+            logger.exception("Error during dispensing: %s", e)
         finally:
             self.disable_motor()
 
-    def preprocess_frame(self, frame):
-        """Prepare a captured frame for model inference."""
-        resized = cv2.resize(frame, IMAGE_SIZE)
-        rgb = cv2.cvtColor(resized, cv2.COLOR_BGR2RGB)
-        flattened = rgb.flatten().reshape(1, -1)
-        return flattened
+    def preprocess_frame(self, frame, slot=0):
+        """Prepare a captured frame for model inference.
+
+        Writes into row `slot` of the shared preprocessing buffer and returns a
+        (1, N) view of it, which is overwritten by the next call for that slot.
+        Pixels stay in BGR order when direct linear inference is active.
+        """
+        view = self._img_views[slot]
+        # INTER_AREA averages source pixels, the right filter when shrinking camera frames
+        cv2.resize(frame, self.image_size, dst=view, interpolation=cv2.INTER_AREA)
+        if self._weights is None:
+            # Only predict_proba needs RGB; the linear path uses BGR-ordered weights
+            cv2.cvtColor(view, cv2.COLOR_BGR2RGB, dst=view)
+        return self._frame_buf[slot:slot + 1]
+
+    def capture_burst(self, frame):
+        """Preprocess `frame` plus up to BURST_FRAMES - 1 newer frames; return the (k, N) batch."""
+        self.preprocess_frame(frame, 0)
+        count = 1
+        while count < BURST_FRAMES:
+            time.sleep(BURST_INTERVAL)
+            ret, frame = self.frames.read()
+            if not ret:
+                break
+            self.preprocess_frame(frame, count)
+            count += 1
+        return self._frame_buf[:count]
 
     def save_debug_image(self, frame, timestamp, prediction, is_empty, confidence):
         """Save the captured image and append metadata for debugging."""
         # Create a debug_images folder relative to this file
         debug_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "debug_images")
-        if not os.path.exists(debug_dir):
-            os.makedirs(debug_dir)
+        os.makedirs(debug_dir, exist_ok=True)
         
         # Create a filename based on the current timestamp
-        dt_str = datetime.fromtimestamp(timestamp).strftime("%Y%m%d-%H%M%S")
+        dt_str = time.strftime("%Y%m%d-%H%M%S", time.localtime(timestamp))
         filename = f"capture_{dt_str}.jpg"
         file_path = os.path.join(debug_dir, filename)
         
@@ -181,8 +506,6 @@ class BowlStateAndHopperController:
         cv2.imwrite(file_path, frame)
         
         # Append metadata to a CSV file
-        metadata_file = os.path.join(debug_dir, "metadata.csv")
-        header = ["timestamp", "filename", "frame_shape", "prediction", "is_empty", "confidence"]
         data_line = [
             str(timestamp),
             filename,
@@ -191,42 +514,99 @@ class BowlStateAndHopperController:
             str(is_empty),
             str(confidence)
         ]
-        write_header = not os.path.exists(metadata_file) or os.stat(metadata_file).st_size == 0
         try:
-            with open(metadata_file, "a", newline="") as csvfile:
-                writer = csv.writer(csvfile)
-                if write_header:
-                    writer.writerow(header)
-                writer.writerow(data_line)
-            logger.info(f"Saved debug image to {file_path} with metadata appended.")
+            self.metadata_writer(debug_dir).writerow(data_line)
+            logger.info("Saved debug image to %s with metadata appended.", file_path)
         except Exception as e:
-            logger.error(f"Failed to write debug metadata: {e}")
+            logger.error("Failed to write debug metadata: %s", e)
+
+    def start_debug_writer(self):
+        """Start the background thread that writes queued debug captures."""
+        self._debug_writer = threading.Thread(target=self._debug_write_loop, name="DebugWriter", daemon=True)
+        self._debug_writer.start()
+
+    def stop_debug_writer(self):
+        """Signal the debug writer to exit once queued captures are written."""
+        if self._debug_writer is None:
+            return
+        try:
+            self._debug_queue.put(None, timeout=5.0)
+        except queue.Full:
+            logger.warning("Debug writer did not drain; exiting without waiting")
+            return
+        self._debug_writer.join(timeout=5.0)
+
+    def queue_debug_image(self, frame, timestamp, prediction, is_empty, confidence):
+        """Hand a capture to the debug writer without blocking."""
+        # Frames from retrieve() and prediction arrays are never reused, so no copy is needed
+        try:
+            self._debug_queue.put_nowait((frame, timestamp, prediction, is_empty, confidence))
+        except queue.Full:
+            logger.warning("Debug image queue full; dropping capture")
+
+    def _debug_write_loop(self):
+        """Write queued debug captures to disk."""
+        while True:
+            item = self._debug_queue.get()
+            if item is None:
+                break
+            self.save_debug_image(*item)
+
+    def metadata_writer(self, debug_dir):
+        """Return the CSV writer for debug metadata, opening the file on first use."""
+        if self._metadata_writer is None:
+            # Line buffering flushes each row without reopening the file per capture
+            self._metadata_file = open(os.path.join(debug_dir, "metadata.csv"), "a", buffering=1, newline="")
+            self._metadata_writer = csv.writer(self._metadata_file)
+            # Append mode opens positioned at EOF, so an empty file needs no extra stat
+            if self._metadata_file.tell() == 0:
+                self._metadata_writer.writerow(
+                    ["timestamp", "filename", "frame_shape", "prediction", "is_empty", "confidence"]
+                )
+        return self._metadata_writer
+
+    def frame_thumbnail(self, frame):
+        """Downsample a frame to a small greyscale thumbnail for change detection."""
+        small = cv2.resize(frame, FRAME_DIFF_SIZE, interpolation=cv2.INTER_AREA)
+        return cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+
+    def can_reuse_prediction(self, thumbnail):
+        """Return True if the scene has not changed since the last inference."""
+        if self._last_thumbnail is None or self._prediction_reuse >= MAX_PREDICTION_REUSE:
+            return False
+        diff = cv2.absdiff(thumbnail, self._last_thumbnail)
+        return float(diff.mean()) < FRAME_DIFF_THRESHOLD
 
     def is_bowl_empty(self):
-        """Capture a frame and determine if the bowl is empty."""
-        # Flush extra frames to get a more up-to-date image
-        for _ in range(5):
-            self.cap.grab()
-            ret, frame = self.cap.read()
-        ret, frame = self.cap.read()
+        """Capture a frame and return (is_empty, confidence), or None if no detection was made."""
+        ret, frame = self.frames.read()
         if not ret:
             logger.error("Failed to capture frame")
-            return False, 0.0
+            return None
 
         # Get current timestamp and log frame details
         capture_time = time.time()
-        logger.info(f"Captured frame at {capture_time} with shape {frame.shape}")
-
-        processed = self.preprocess_frame(frame)
-        try:
-            prediction = self.model.predict_proba(processed)[0]
-        except Exception as e:
-            logger.error(f"Error during model inference: {e}")
-            return False, 0.0
+        logger.info("Captured frame at %s with shape %s", capture_time, frame.shape)
+
+        thumbnail = self.frame_thumbnail(frame)
+        if self.can_reuse_prediction(thumbnail):
+            self._prediction_reuse += 1
+            prediction = self._last_prediction
+            logger.info("Frame unchanged since last inference; reusing prediction")
+        else:
+            processed = self.capture_burst(frame)
+            try:
+                prediction = self.predict(processed)
+            except Exception as e:
+                logger.error("Error during model inference: %s", e)
+                return None
+            self._last_thumbnail = thumbnail
+            self._last_prediction = prediction
+            self._prediction_reuse = 0
 
         # Standard decision based on the model's prediction
         is_empty = prediction[0] > CONFIDENCE_THRESHOLD
-        confidence = float(max(prediction))
+        confidence = float(prediction.max())
 
         # If in debug mode, override the model’s decision so the motor always activates
         if DEBUG_MODE:
@@ -235,9 +615,9 @@ class BowlStateAndHopperController:
 
         # Save the debug image and metadata if enabled.
         if DEBUG_SAVE_IMAGES:
-            self.save_debug_image(frame, capture_time, prediction, is_empty, confidence)
+            self.queue_debug_image(frame, capture_time, prediction, is_empty, confidence)
 
-        logger.info(f"Model prediction: {prediction} => bowl is {'empty' if is_empty else 'full'} with confidence {confidence:.2f}")
+        logger.info("Model prediction: %s => bowl is %s with confidence %.2f", prediction, 'empty' if is_empty else 'full', confidence)
         return is_empty, confidence
 
     def get_ipc_client(self):
@@ -246,57 +626,143 @@ class BowlStateAndHopperController:
         RETRY_INTERVAL = 2  # seconds
         for attempt in range(MAX_RECONNECT_ATTEMPTS):
             try:
-                logger.info(f"Connecting to IPC (attempt {attempt + 1}/{MAX_RECONNECT_ATTEMPTS})...")
+                logger.info("Connecting to IPC (attempt %s/%s)...", attempt + 1, MAX_RECONNECT_ATTEMPTS)
                 ipc_client = awsiot.greengrasscoreipc.connect()
                 logger.info("Successfully connected to IPC")
                 return ipc_client
             except Exception as e:
-                logger.error(f"IPC connection attempt {attempt + 1} failed: {str(e)}")
+                logger.error("IPC connection attempt %s failed: %s", attempt + 1, e)
                 if attempt < MAX_RECONNECT_ATTEMPTS - 1:
                     time.sleep(RETRY_INTERVAL)
         raise ConnectionError("Failed to establish IPC connection after maximum retries")
 
-    def publish_state(self, is_empty, confidence):
+    def publish_state(self, is_empty, confidence, timestamp=None):
         """Publish bowl state via MQTT with retry logic."""
         MAX_PUBLISH_RETRIES = 3
+        if timestamp is None:
+            timestamp = time.time()
 
         # Add an extra field to indicate whether the motor should be activated
         motor_activation = bool(is_empty and confidence > CONFIDENCE_THRESHOLD)
-        message = {
-            "message": "Bowl State Update",
-            "empty": bool(is_empty),
-            "confidence": float(confidence),
-            "timestamp": time.time(),
-            "activateMotor": motor_activation
-        }
-
-        request = PublishToIoTCoreRequest(
-            topic_name="bowl/state",
-            qos=QOS.AT_LEAST_ONCE,
-            payload=json.dumps(message).encode()
+        message = STATE_PAYLOAD_TEMPLATE % (
+            JSON_BOOL[bool(is_empty)], float(confidence), float(timestamp), JSON_BOOL[motor_activation]
         )
 
+        request = self._publish_request
+        request.payload = message.encode()
+
         for attempt in range(MAX_PUBLISH_RETRIES):
             try:
                 operation = self.ipc_client.new_publish_to_iot_core()
                 operation.activate(request)
                 future = operation.get_response()
                 future.result(timeout=5.0)
-                logger.info(f"Successfully published: {message}")
+                logger.info("Successfully published: %s", message)
                 return True
             except Exception as e:
-                logger.error(f"Publish attempt {attempt + 1} failed: {str(e)}")
+                # Only the final failure is worth a stack trace
                 if attempt == MAX_PUBLISH_RETRIES - 1:
-                    logger.error(traceback.format_exc())
-                if attempt < MAX_PUBLISH_RETRIES - 1:
+                    logger.exception("Publish attempt %s failed: %s", attempt + 1, e)
+                else:
+                    logger.warning("Publish attempt %s failed: %s", attempt + 1, e)
                     time.sleep(1)
         return False
 
+    def start_publisher(self):
+        """Start the background thread that drains queued state updates."""
+        self._publisher = threading.Thread(target=self._publish_loop, name="StatePublisher", daemon=True)
+        self._publisher.start()
+
+    def stop_publisher(self):
+        """Signal the publisher thread to exit and wait briefly for it."""
+        if self._publisher is None:
+            return
+        try:
+            self._publish_queue.put_nowait(None)
+        except queue.Full:
+            pass
+        self._publisher.join(timeout=5.0)
+
+    def queue_state(self, is_empty, confidence):
+        """Hand a state update to the publisher thread without blocking."""
+        try:
+            self._publish_queue.put_nowait((is_empty, confidence, time.time()))
+        except queue.Full:
+            logger.warning("Publish queue full; dropping state update")
+
+    def _publish_loop(self):
+        """Publish queued state updates and track consecutive failures."""
+        while True:
+            item = self._publish_queue.get()
+            if item is None:
+                break
+            is_empty, confidence, timestamp = item
+            # Publish only on change, plus a periodic heartbeat so subscribers see liveness
+            state = (bool(is_empty), round(float(confidence), 2))
+            now = time.monotonic()
+            if state == self._last_published and now - self._last_publish_time < STATE_HEARTBEAT_INTERVAL:
+                continue
+            if self.publish_state(is_empty, confidence, timestamp):
+                self._last_published = state
+                self._last_publish_time = now
+                self.consecutive_failures = 0
+                continue
+            self.consecutive_failures += 1
+            logger.warning("Publishing failed %s times consecutively", self.consecutive_failures)
+            if self.consecutive_failures >= self.MAX_CONSECUTIVE_FAILURES:
+                logger.warning("Too many consecutive publish failures; recreating IPC client...")
+                self.ipc_client = None
+                self.consecutive_failures = 0
+
+    def should_dispense(self, empty):
+        """Record one tick's decision; True once enough recent ticks saw an empty bowl."""
+        self._empty_history = ((self._empty_history << 1) | int(empty)) & DISPENSE_WINDOW_MASK
+        if bin(self._empty_history).count("1") < DISPENSE_MIN_EMPTY:
+            return False
+        # Start over after a dispense so pre-dispense ticks cannot trigger another
+        self._empty_history = 0
+        return True
+
+    def start_dispenser(self):
+        """Start the background thread that runs queued dispense requests."""
+        self._dispenser = threading.Thread(target=self._dispense_loop, name="Dispenser", daemon=True)
+        self._dispenser.start()
+
+    def stop_dispenser(self):
+        """Signal the dispenser thread to exit after any active dispense."""
+        if self._dispenser is None:
+            return
+        try:
+            # Waits out a pending request so the sentinel is not dropped
+            self._dispense_queue.put(None, timeout=10.0)
+        except queue.Full:
+            logger.warning("Dispenser did not drain; exiting without waiting")
+            return
+        self._dispenser.join(timeout=10.0)
+
+    def request_dispense(self, portions=1):
+        """Queue a dispense without blocking; ignored if one is already waiting."""
+        try:
+            self._dispense_queue.put_nowait(portions)
+        except queue.Full:
+            logger.info("Dispense already pending; ignoring request")
+
+    def _dispense_loop(self):
+        """Run queued dispense requests one at a time."""
+        # Keep step timing steady under load when pigpio is unavailable
+        if set_realtime_priority(DISPENSE_RT_PRIORITY):
+            logger.info("Dispenser thread running with SCHED_FIFO priority %d", DISPENSE_RT_PRIORITY)
+        while True:
+            portions = self._dispense_queue.get()
+            if portions is None:
+                break
+            self.dispense(portions)
+
     def subscribe_for_commands(self):
         """Subscribe to the 'bowl/command' topic to allow ad-hoc motor triggers."""
         try:
             subscribe_request = SubscribeToTopicRequest(
-                topic="bowl/command",
+                topic=COMMAND_TOPIC,
                 qos=QOS.AT_LEAST_ONCE
             )
 
@@ -304,68 +770,94 @@ class BowlStateAndHopperController:
                 try:
                     payload = message.payload.decode()
                     command = json.loads(payload)
-                    logger.info(f"Received command: {command}")
+                    logger.info("Received command: %s", command)
                     if command.get("empty") is True:
                         logger.info("Ad-hoc command received. Triggering motor dispensing...")
-                        self.dispense()
+                        self.request_dispense()
                 except Exception as e:
-                    logger.error(f"Error processing command message: {e}")
+                    logger.error("Error processing command message: %s", e)
 
             subscribe_op = self.ipc_client.new_subscribe_to_topic()
             subscribe_op.activate(subscribe_request, on_stream_event=on_command)
             logger.info("Subscribed to 'bowl/command' topic for ad-hoc motor triggers.")
         except Exception as e:
-            logger.error(f"Failed to subscribe for commands: {e}")
+            logger.error("Failed to subscribe for commands: %s", e)
+
+    def stop(self):
+        """Ask the main loop to exit at its next check."""
+        self._stop_event.set()
+
+    def handle_sigterm(self, signum, frame):
+        """Signal handler: unwind the main loop by raising StopRequested."""
+        # Setting the Event here could deadlock if the signal lands while the main
+        # thread holds the Event's condition lock inside wait(); raising cannot
+        raise StopRequested()
 
     def run(self):
         """Main loop that combines bowl state detection, motor dispensing, and command subscription."""
         logger.info("Starting combined BowlState and Hopper controller...")
+        # Greengrass stops components with SIGTERM; exit through the cleanup below
+        signal.signal(signal.SIGTERM, self.handle_sigterm)
         try:
             self.ipc_client = self.get_ipc_client()
             self.subscribe_for_commands()
+            self.start_publisher()
+            self.start_dispenser()
+            if DEBUG_SAVE_IMAGES:
+                self.start_debug_writer()
+            self.frames.start()
 
-            while True:
+            while not self._stop_event.is_set():
                 try:
                     if self.ipc_client is None:
                         self.ipc_client = self.get_ipc_client()
                         self.subscribe_for_commands()
                     
-                    is_empty, conf = self.is_bowl_empty()
-                    logger.info(f"Bowl is {'empty' if is_empty else 'full'} with confidence {conf:.2f}")
-
-                    # Publish the state update.
-                    if not self.publish_state(is_empty, conf):
-                        self.consecutive_failures += 1
-                        logger.warning(f"Publishing failed {self.consecutive_failures} times consecutively")
-                        if self.consecutive_failures >= self.MAX_CONSECUTIVE_FAILURES:
-                            logger.warning("Too many consecutive publish failures; recreating IPC client...")
-                            self.ipc_client = None
-                            self.consecutive_failures = 0
-                    else:
-                        self.consecutive_failures = 0
+                    result = self.is_bowl_empty()
+                    if result is None:
+                        # A failed capture is not a reading; publishing or acting on it
+                        # would report a made-up "full" state
+                        self._stop_event.wait(LOOP_INTERVAL)
+                        continue
+                    is_empty, conf = result
+                    logger.info("Bowl is %s with confidence %.2f", 'empty' if is_empty else 'full', conf)
+
+                    # Publish the state update in the background.
+                    self.queue_state(is_empty, conf)
 
                     # If in debug mode, force dispensing regardless of detection.
                     if DEBUG_MODE:
                         logger.info("DEBUG_MODE active: Forcing motor dispensing.")
-                        self.dispense()
-                    elif is_empty and conf > CONFIDENCE_THRESHOLD:
+                        self.request_dispense()
+                    elif self.should_dispense(is_empty and conf > CONFIDENCE_THRESHOLD):
                         logger.info("Bowl detected as empty, initiating dispensing...")
-                        self.dispense()
+                        self.request_dispense()
 
-                    time.sleep(10)  # Adjust the loop delay as needed.
+                    self._stop_event.wait(LOOP_INTERVAL)
                 except Exception as e:
-                    logger.error(f"Error in main loop: {str(e)}")
-                    logger.error(traceback.format_exc())
-                    time.sleep(10)
+                    logger.exception("Error in main loop: %s", e)
+                    self._stop_event.wait(LOOP_INTERVAL)
+            logger.info("Stop requested. Exiting.")
         except KeyboardInterrupt:
             logger.info("Keyboard interrupt received. Exiting.")
+        except StopRequested:
+            logger.info("SIGTERM received. Exiting.")
         except Exception as e:
-            logger.error(f"Fatal error: {str(e)}")
-            logger.error(traceback.format_exc())
+            logger.exception("Fatal error: %s", e)
         finally:
+            # A repeated SIGTERM must not abort the cleanup below
+            signal.signal(signal.SIGTERM, signal.SIG_IGN)
+            self.stop_publisher()
+            self.stop_dispenser()
+            self.frames.stop()
+            self.stop_debug_writer()
+            if self._metadata_file is not None:
+                self._metadata_file.close()
             if self.cap:
                 self.cap.release()
                 logger.info("Camera released")
+            if self.pi is not None:
+                self.pi.stop()
             GPIO.cleanup()
             logger.info("GPIO cleaned up")
             logger.info("Component shutdown complete")
@@ -1,8 +1,7 @@
 #!/usr/bin/env python3
 import time
 import json
-import traceback
-import sys
+import logging
 import awsiot.greengrasscoreipc
 import awsiot.greengrasscoreipc.client as client
 from awsiot.greengrasscoreipc.model import (
@@ -10,13 +9,24 @@ from awsiot.greengrasscoreipc.model import (
     QOS
 )
 
-print("Starting MQTT Test Component...")
-sys.stdout.flush()
+# Log handlers flush every record, so no explicit stdout flushing is needed
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+)
+logger = logging.getLogger("MQTTTest")
+
+logger.info("Starting MQTT Test Component...")
 
 try:
     ipc_client = awsiot.greengrasscoreipc.connect()
-    print("Successfully connected to IPC client")
-    sys.stdout.flush()
+    logger.info("Successfully connected to IPC client")
+    
+    # Topic and QoS never change; only the payload is replaced per message
+    request = PublishToIoTCoreRequest(
+        topic_name="test/messages",
+        qos=QOS.AT_LEAST_ONCE
+    )
     
     while True:
         try:
@@ -24,29 +34,19 @@ try:
                 "message": "Hello from Greengrass!",
                 "timestamp": time.time()
             }
-            
-            request = PublishToIoTCoreRequest(
-                topic_name="test/messages",
-                qos=QOS.AT_LEAST_ONCE,
-                payload=json.dumps(message).encode()
-            )
+            request.payload = json.dumps(message).encode()
             
             operation = ipc_client.new_publish_to_iot_core()
             operation.activate(request)
             future = operation.get_response()
             future.result(timeout=5.0)
             
-            print(f"Successfully published: {message}")
-            sys.stdout.flush()
+            logger.info("Successfully published: %s", message)
             
         except Exception as e:
-            print(f"Failed to publish message: {e}")
-            print(traceback.format_exc())
-            sys.stdout.flush()
+            logger.exception("Failed to publish message: %s", e)
         
         time.sleep(5)
 
 except Exception as e:
-    print(f"Exception in main: {e}")
-    print(traceback.format_exc())
-    sys.stdout.flush()
+    logger.exception("Exception in main: %s", e)
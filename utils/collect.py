@@ -5,19 +5,58 @@ Captures and saves labeled images for training.
 """
 import cv2
 import time
-import yaml
 from pathlib import Path
 import logging
 import argparse
+import os
+from concurrent.futures import ThreadPoolExecutor
+from common import list_jpgs, load_yaml
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# JPEG start-of-frame markers; each carries the image height and width
+JPEG_SOF_MARKERS = frozenset((0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7,
+                              0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF))
+
+def jpeg_size(path):
+    """Read (width, height) from a JPEG's frame header without decoding it, or None."""
+    with open(path, 'rb') as f:
+        if f.read(2) != b'\xff\xd8':
+            return None
+        while True:
+            marker = f.read(2)
+            if len(marker) < 2 or marker[0] != 0xFF:
+                return None
+            code = marker[1]
+            while code == 0xFF:  # Fill bytes before a marker
+                fill = f.read(1)
+                if not fill:
+                    return None
+                code = fill[0]
+            if code == 0x01 or 0xD0 <= code <= 0xD7:  # Markers without a length
+                continue
+            length = f.read(2)
+            if len(length) < 2:
+                return None
+            if code in JPEG_SOF_MARKERS:
+                header = f.read(5)  # precision, height, width
+                if len(header) < 5:
+                    return None
+                return int.from_bytes(header[3:5], 'big'), int.from_bytes(header[1:3], 'big')
+            f.seek(int.from_bytes(length, 'big') - 2, os.SEEK_CUR)
+
+def jpeg_has_eoi(path):
+    """Return True if a JPEG ends with its end-of-image marker, ignoring trailing zero padding."""
+    with open(path, 'rb') as f:
+        f.seek(0, os.SEEK_END)
+        f.seek(max(0, f.tell() - 64))
+        return f.read().rstrip(b'\x00').endswith(b'\xff\xd9')
+
 class DataCollector:
     def __init__(self, config_path, storage_path):
         """Initialize data collector with configuration."""
-        with open(config_path, 'r') as f:
-            self.config = yaml.safe_load(f)
+        self.config = load_yaml(config_path)
         
         self.data_dir = Path(storage_path)
         self.camera = None
@@ -25,15 +64,19 @@ class DataCollector:
     
     def setup_camera(self):
         """Initialize the camera."""
-        self.camera = cv2.VideoCapture(self.config['hardware']['camera']['device_id'])
+        self.camera = cv2.VideoCapture(self.config['hardware']['camera']['device_id'], cv2.CAP_V4L2)
         if not self.camera.isOpened():
             raise RuntimeError("Failed to open camera")
         
+        # Request MJPG before the resolution so the driver negotiates a compressed mode
+        self.camera.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*'MJPG'))
         # Set camera resolution from config
         cam_width = self.config['hardware']['camera']['resolution']['width']
         cam_height = self.config['hardware']['camera']['resolution']['height']
         self.camera.set(cv2.CAP_PROP_FRAME_WIDTH, cam_width)
         self.camera.set(cv2.CAP_PROP_FRAME_HEIGHT, cam_height)
+        # Keep only the newest frame queued so captures are never stale
+        self.camera.set(cv2.CAP_PROP_BUFFERSIZE, 1)
     
     def collect_samples(self, label, num_samples):
         """Collect labeled samples for training."""
@@ -45,9 +88,9 @@ class DataCollector:
             logger.info(f"Collecting {num_samples} samples for '{label}' state")
             count = 0
 
-            # Clear any buffered frames
+            # Clear any buffered frames; grab() dequeues without decoding
             for _ in range(3):
-                self.camera.read()
+                self.camera.grab()
 
             while count < num_samples:
                 ret, frame = self.camera.read()
@@ -56,7 +99,7 @@ class DataCollector:
                     continue
                 
                 # Resize to training size and save
-                resized = cv2.resize(frame, self.image_size)
+                resized = cv2.resize(frame, self.image_size, interpolation=cv2.INTER_AREA)
                 timestamp = time.strftime("%Y%m%d_%H%M%S")
                 filename = f"{label}_{timestamp}_{count:02d}.jpg"
                 save_path = save_dir / filename
@@ -70,27 +113,44 @@ class DataCollector:
             if self.camera is not None:
                 self.camera.release()
     
+    def check_image(self, image_path):
+        """Return an image's (width, height), or None if it is unreadable."""
+        # A parsable frame header plus a final EOI marker catches truncated files
+        # without decoding; anything else gets a full decode as the real check
+        try:
+            size = jpeg_size(image_path)
+            if size is not None and jpeg_has_eoi(image_path):
+                return size
+            img = cv2.imread(image_path)
+        except Exception:
+            return None
+        if img is None:
+            return None
+        h, w = img.shape[:2]
+        return w, h
+    
     def verify_dataset(self):
         """Verify collected dataset."""
         stats = {}
         corrupted = []
+        samples = []
         
         for label_dir in self.data_dir.iterdir():
             if label_dir.is_dir():
-                label = label_dir.name
-                stats[label] = 0
-                for image_path in label_dir.glob('*.jpg'):
-                    try:
-                        img = cv2.imread(str(image_path))
-                        if img is None:
-                            corrupted.append(image_path)
-                        else:
-                            h, w = img.shape[:2]
-                            if (w, h) != self.image_size:
-                                logger.warning(f"Wrong size for {image_path}: {w}x{h}, expected: {self.image_size}")
-                            stats[label] += 1
-                    except Exception as e:
-                        corrupted.append(image_path)
+                stats[label_dir.name] = 0
+                samples.extend((label_dir.name, path) for path in list_jpgs(label_dir))
+        
+        # Header reads and fallback decodes release the GIL, so a thread pool overlaps them
+        with ThreadPoolExecutor(max_workers=os.cpu_count()) as executor:
+            sizes = executor.map(self.check_image, [path for _, path in samples])
+            for (label, image_path), size in zip(samples, sizes):
+                if size is None:
+                    corrupted.append(image_path)
+                    continue
+                w, h = size
+                if (w, h) != self.image_size:
+                    logger.warning(f"Wrong size for {image_path}: {w}x{h}, expected: {self.image_size}")
+                stats[label] += 1
         
         logger.info("\nDataset Statistics:")
         for label, count in stats.items():
@@ -0,0 +1,24 @@
+#!/usr/bin/env python3
+"""
+Helpers shared by the data collection, training and verification scripts.
+"""
+import os
+import yaml
+from pathlib import Path
+
+# Project root (the directory above utils/), resolved once at import
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+
+def load_yaml(path):
+    """Parse a YAML file, with the libyaml C parser when PyYAML was built with it."""
+    with open(path, 'r') as f:
+        return yaml.load(f, Loader=getattr(yaml, 'CSafeLoader', yaml.SafeLoader))
+
+def list_jpgs(directory):
+    """Return the paths of the .jpg files directly inside `directory`."""
+    # One scandir pass with a suffix test; Path.glob would fnmatch every entry
+    try:
+        with os.scandir(directory) as it:
+            return [entry.path for entry in it if entry.name.endswith('.jpg') and entry.is_file()]
+    except FileNotFoundError:
+        return []
@@ -5,11 +5,11 @@ Trains a simple classifier to detect bowl state.
 """
 import cv2
 import numpy as np
-import yaml
 import joblib
-from pathlib import Path
 import logging
 import os
+from concurrent.futures import ThreadPoolExecutor
+from common import PROJECT_ROOT, list_jpgs, load_yaml
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -17,8 +17,7 @@ logger = logging.getLogger(__name__)
 class BowlStateTrainer:
     def __init__(self):
         """Initialize trainer with configuration."""
-        # Get project root directory (2 levels up from this file)
-        self.project_root = Path(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+        self.project_root = PROJECT_ROOT
         self.load_config()
         
         # Setup paths
@@ -30,8 +29,7 @@ class BowlStateTrainer:
         """Load configuration from yaml."""
         config_path = self.project_root / 'config' / 'config.yaml'
         try:
-        with open(config_path, 'r') as f:
-            config = yaml.safe_load(f)
+            config = load_yaml(config_path)
             self.image_size = tuple(config['vision']['image_size'])
         except Exception as e:
             logger.error(f"Error loading config: {e}")
@@ -40,30 +38,34 @@ class BowlStateTrainer:
     
     def load_dataset(self):
         """Load and prepare training data."""
-        images = []
-        labels = []
+        # Label 0 = empty bowl, label 1 = full bowl
+        samples = [(path, label)
+                   for label, name in enumerate(('empty', 'full'))
+                   for path in list_jpgs(self.data_dir / 'training' / name)]
         
-        # Load empty bowl images (label 0)
-        empty_dir = self.data_dir / 'training' / 'empty'
-        for img_path in empty_dir.glob('*.jpg'):
-            img = cv2.imread(str(img_path))
-            if img is not None:
-                img = cv2.resize(img, self.image_size)
-                img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
-                images.append(img.flatten())
-                labels.append(0)
+        # Fill one preallocated array in place instead of stacking a list of rows
+        width, height = self.image_size
+        X = np.empty((len(samples), height * width * 3), dtype=np.uint8)
+        y = np.array([label for _, label in samples], dtype=np.int64)
         
-        # Load full bowl images (label 1)
-        full_dir = self.data_dir / 'training' / 'full'
-        for img_path in full_dir.glob('*.jpg'):
-            img = cv2.imread(str(img_path))
-            if img is not None:
-                img = cv2.resize(img, self.image_size)
-                img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
-                images.append(img.flatten())
-                labels.append(1)
+        def load_row(i):
+            """Decode sample i into row i of X; return False if it is unreadable."""
+            img = cv2.imread(samples[i][0])
+            if img is None:
+                return False
+            row = X[i].reshape(height, width, 3)
+            cv2.resize(img, self.image_size, dst=row, interpolation=cv2.INTER_AREA)
+            cv2.cvtColor(row, cv2.COLOR_BGR2RGB, dst=row)
+            return True
         
-        return np.array(images), np.array(labels)
+        # imread, resize and cvtColor release the GIL, so threads decode in parallel;
+        # each worker writes only its own row
+        with ThreadPoolExecutor(max_workers=os.cpu_count()) as executor:
+            loaded = np.fromiter(executor.map(load_row, range(len(samples))), dtype=bool, count=len(samples))
+        
+        if loaded.all():
+            return X, y
+        return X[loaded], y[loaded]
     
     def train(self):
         """Train the model."""
@@ -99,6 +101,8 @@ class BowlStateTrainer:
     def save_model(self, model):
         """Save the trained model."""
         model_path = self.model_dir / 'bowl_state_model.joblib'
+        # joblib dumps uncompressed by default; keep it that way, the detector
+        # memory-maps the coefficient arrays on load
         joblib.dump(model, model_path)
         logger.info(f"Model saved to {model_path}")
 
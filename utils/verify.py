@@ -9,10 +9,10 @@ import joblib
 import time
 import logging
 import argparse
+import json
 import os
-import yaml
-from pathlib import Path
 from tabulate import tabulate
+from common import PROJECT_ROOT, load_yaml
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -20,13 +20,12 @@ logger = logging.getLogger(__name__)
 class ModelVerifier:
     def __init__(self):
         """Initialize verifier with project configuration."""
-        self.project_root = Path(__file__).parent.parent.parent
+        self.project_root = PROJECT_ROOT
         
         # Load configuration
         config_path = self.project_root / 'config' / 'config.yaml'
         try:
-            with open(config_path, 'r') as f:
-                self.config = yaml.safe_load(f)
+            self.config = self.load_config(config_path)
         except Exception as e:
             logger.error(f"Error loading config: {e}")
             raise
@@ -38,34 +37,95 @@ class ModelVerifier:
         logger.info(f"Using image size: {self.image_size}")
         self.load_model()
     
+    def load_config(self, config_path):
+        """Load config.yaml, preferring its JSON sidecar when it is at least as new."""
+        # scripts/build_config_cache.py writes the sidecar; JSON loads far faster than YAML
+        json_path = config_path.with_name(config_path.name + '.json')
+        try:
+            if json_path.stat().st_mtime >= config_path.stat().st_mtime:
+                with open(json_path, 'r') as f:
+                    return json.load(f)
+        except (OSError, ValueError):
+            pass
+        return load_yaml(config_path)
+    
     def load_model(self):
         """Load the trained model."""
         if not self.model_path.exists():
             raise FileNotFoundError(f"Model not found at {self.model_path}")
-        self.model = joblib.load(self.model_path)
+        # Memory-map the uncompressed arrays; only the float32 copy below stays resident
+        self.model = joblib.load(self.model_path, mmap_mode='r')
         logger.info("Model loaded successfully")
+        
+        # Binary linear models are scored directly with float32 weights
+        width, height = self.image_size
+        coef = getattr(self.model, 'coef_', None)
+        if (coef is not None and coef.shape == (1, height * width * 3)
+                and len(getattr(self.model, 'classes_', ())) == 2):
+            # Training uses RGB pixels; reordering the weights to BGR once lets
+            # OpenCV frames be scored without a colour conversion per image
+            bgr = coef[0].reshape(height, width, 3)[:, :, ::-1]
+            self.weights = np.ascontiguousarray(bgr, dtype=np.float32).ravel()
+            self.bias = float(self.model.intercept_[0])
+        else:
+            self.weights = self.bias = None
     
-    def preprocess_image(self, image):
-        """Preprocess image for inference."""
-        resized = cv2.resize(image, self.image_size)
-        rgb = cv2.cvtColor(resized, cv2.COLOR_BGR2RGB)
-        return rgb.reshape(1, -1)
+    def predict_proba(self, processed):
+        """Return [P(empty), P(full)] rows for preprocessed (N, features) images."""
+        if self.weights is None:
+            return self.model.predict_proba(processed)
+        # uint8 pixels against float32 weights stays in single precision
+        scores = processed @ self.weights + self.bias
+        p_full = np.exp(-np.logaddexp(0.0, -scores))
+        return np.column_stack((1.0 - p_full, p_full))
+    
+    def preprocess_image(self, image, out=None):
+        """Preprocess image for inference, writing into `out` (1, features) when given.
+        
+        Pixels stay in BGR order when the linear weights have been reordered to match.
+        """
+        width, height = self.image_size
+        if out is None:
+            out = np.empty((1, height * width * 3), dtype=np.uint8)
+        # Resize and colour-convert in place in the destination row, no temporaries
+        view = out.reshape(height, width, 3)
+        cv2.resize(image, self.image_size, dst=view, interpolation=cv2.INTER_AREA)
+        if self.weights is None:
+            # Only predict_proba needs RGB; the linear path uses BGR-ordered weights
+            cv2.cvtColor(view, cv2.COLOR_BGR2RGB, dst=view)
+        return out
     
     def predict(self, image):
         """Run prediction with timing."""
-        start_time = time.time()
         processed = self.preprocess_image(image)
-        prediction = self.model.predict_proba(processed)[0]
-        inference_time = time.time() - start_time
+        # Time only the model itself, with an integer monotonic clock
+        start_ns = time.perf_counter_ns()
+        prediction = self.predict_proba(processed)[0]
+        inference_time = (time.perf_counter_ns() - start_ns) * 1e-9
         
         is_empty = prediction[0] > 0.5
         confidence = prediction[0] if is_empty else 1 - prediction[0]
         
         return is_empty, confidence, inference_time
     
+    def predict_batch(self, images):
+        """Run one batched prediction over several images, with per-image timing."""
+        width, height = self.image_size
+        processed = np.empty((len(images), height * width * 3), dtype=np.uint8)
+        for i, image in enumerate(images):
+            self.preprocess_image(image, out=processed[i:i + 1])
+        start_ns = time.perf_counter_ns()
+        prediction = self.predict_proba(processed)
+        inference_time = (time.perf_counter_ns() - start_ns) * 1e-9 / len(images)
+        
+        is_empty = prediction[:, 0] > 0.5
+        confidence = np.where(is_empty, prediction[:, 0], 1 - prediction[:, 0])
+        
+        return is_empty, confidence, inference_time
+    
     def test_sample_images(self):
         """Test model with saved training images."""
-        results = []
+        names, expected, images = [], [], []
         
         for state in ['empty', 'full']:
             image_dir = self.data_path / state
@@ -78,31 +138,48 @@ class ModelVerifier:
                 image = cv2.imread(str(img_path))
                 if image is None:
                     continue
-                
-                is_empty, confidence, inference_time = self.predict(image)
-                results.append({
-                    'image': img_path.name,
-                    'expected': state == 'empty',
-                    'predicted': is_empty,
-                    'confidence': confidence,
-                    'time_ms': inference_time * 1000
-                })
-        
-        return results
+                names.append(img_path.name)
+                expected.append(state == 'empty')
+                images.append(image)
+        
+        if not images:
+            return {'image': []}
+        
+        # Score every sample in one matrix product rather than one call per image
+        is_empty, confidence, inference_time = self.predict_batch(images)
+        return {
+            'image': names,
+            'expected': np.array(expected),
+            'predicted': is_empty,
+            'confidence': confidence,
+            'time_ms': np.full(len(names), inference_time * 1000)
+        }
     
     def test_live(self, num_tests=5):
         """Test model with live camera feed."""
-        results = []
-        cap = cv2.VideoCapture(0)
+        # Results are kept as columns so statistics are single array reductions
+        names = []
+        predicted = np.empty(num_tests, dtype=bool)
+        confidences = np.empty(num_tests)
+        times_ms = np.empty(num_tests)
+        cap = cv2.VideoCapture(0, cv2.CAP_V4L2)
         
         if not cap.isOpened():
             raise RuntimeError("Failed to open camera")
+        # Ask for a compressed stream near the model input size; the driver picks
+        # the closest mode it supports and preprocessing resizes the rest of the way
+        width, height = self.image_size
+        cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*'MJPG'))
+        cap.set(cv2.CAP_PROP_FRAME_WIDTH, width)
+        cap.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
+        # Keep only the newest frame queued so the flush below has little to drain
+        cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
         
         try:
             for i in range(num_tests):
-                # Clear buffer
+                # Clear buffer; grab() dequeues without decoding
                 for _ in range(3):
-                    cap.read()
+                    cap.grab()
                 
                 ret, frame = cap.read()
                 if not ret:
@@ -114,53 +191,58 @@ class ModelVerifier:
                 state = "empty" if is_empty else "full"
                 logger.info(f"Test {i+1}: Predicted {state} (confidence: {confidence:.2f})")
                 
-                results.append({
-                    'image': f'live_{i}',
-                    'predicted': is_empty,
-                    'confidence': confidence,
-                    'time_ms': inference_time * 1000
-                })
+                n = len(names)
+                names.append(f'live_{i}')
+                predicted[n] = is_empty
+                confidences[n] = confidence
+                times_ms[n] = inference_time * 1000
                 
                 time.sleep(1)  # Wait between captures
                 
         finally:
             cap.release()
         
-        return results
+        n = len(names)
+        return {
+            'image': names,
+            'predicted': predicted[:n],
+            'confidence': confidences[:n],
+            'time_ms': times_ms[:n]
+        }
     
     def print_results(self, results):
         """Print verification results in a formatted table."""
-        if not results:
+        if not results['image']:
             logger.error("No results to display")
             return
         
         # Calculate statistics
-        if 'expected' in results[0]:
-            correct = sum(1 for r in results if r['expected'] == r['predicted'])
-            accuracy = correct / len(results) * 100
+        has_expected = 'expected' in results
+        if has_expected:
+            accuracy = np.mean(results['expected'] == results['predicted']) * 100
             logger.info(f"Accuracy: {accuracy:.1f}%")
         
-        avg_time = sum(r['time_ms'] for r in results) / len(results)
-        avg_conf = sum(r['confidence'] for r in results) / len(results)
+        avg_time = results['time_ms'].mean()
+        avg_conf = results['confidence'].mean()
         
         logger.info(f"Average inference time: {avg_time:.1f}ms")
         logger.info(f"Average confidence: {avg_conf:.2f}")
         
         # Create table
         table_data = []
-        for r in results:
+        for i, name in enumerate(results['image']):
             row = [
-                r['image'],
-                'Empty' if r['predicted'] else 'Full',
-                f"{r['confidence']:.2f}",
-                f"{r['time_ms']:.1f}ms"
+                name,
+                'Empty' if results['predicted'][i] else 'Full',
+                f"{results['confidence'][i]:.2f}",
+                f"{results['time_ms'][i]:.1f}ms"
             ]
-            if 'expected' in r:
-                row.insert(1, 'Empty' if r['expected'] else 'Full')
+            if has_expected:
+                row.insert(1, 'Empty' if results['expected'][i] else 'Full')
             table_data.append(row)
         
         headers = ['Image', 'Predicted', 'Confidence', 'Time']
-        if 'expected' in results[0]:
+        if has_expected:
             headers.insert(1, 'Expected')
         
         print('\n' + tabulate(table_data, headers=headers, tablefmt='grid'))